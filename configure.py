@@ -51,8 +51,14 @@
 
 # Modules
 import argparse
-import glob
+import functools
+import hashlib
+import json
+import os
+import platform
 import re
+import sys
+import tempfile
 
 
 # Set template and output filenames
@@ -61,6 +67,9 @@ makefile_output = 'Makefile'
 defsfile_input = 'src/defs.hpp.in'
 defsfile_output = 'src/defs.hpp'
 
+# Placeholders of the form @TAG@ in the template files
+template_token = re.compile(r'@(\w+)@')
+
 # --- Step 1. Prepare parser, add each of the arguments ------------------
 athena_description = (
     "Prepare custom Makefile and defs.hpp for compiling Athena++ solver"
@@ -69,18 +78,55 @@ athena_epilog = (
     "Full documentation of options available at "
     "https://github.com/PrincetonUniversity/athena-public-version/wiki/Configuring"
 )
-parser = argparse.ArgumentParser(description=athena_description, epilog=athena_epilog)
+parser = argparse.ArgumentParser(prog='configure.py', description=athena_description,
+                                 epilog=athena_epilog)
 
 # --prob=[name] argument
 pgen_directory = 'src/pgen/'
-# set pgen_choices to list of .cpp files in src/pgen/
-pgen_choices = glob.glob(pgen_directory + '*.cpp')
-# remove 'src/pgen/' prefix and '.cpp' extension from each filename
-pgen_choices = [choice[len(pgen_directory):-4] for choice in pgen_choices]
+
+
+# The directory listing and the template files below are cached on their modification
+# times, so repeated configurations within one Python process only touch them once
+@functools.lru_cache(maxsize=1)
+def pgen_list(pgen_mtime):
+    # names of .cpp files in src/pgen/, without the '.cpp' extension
+    with os.scandir(pgen_directory) as entries:
+        return tuple(entry.name[:-4] for entry in entries
+                     if entry.name.endswith('.cpp') and entry.is_file())
+
+
+def pgen_choices():
+    return pgen_list(os.stat(pgen_directory).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=2)
+def template_contents(filename, mtime):
+    with open(filename, 'r') as current_file:
+        return current_file.read()
+
+
+def read_template(filename):
+    return template_contents(filename, os.stat(filename).st_mtime_ns)
+
+
+class PgenAction(argparse.Action):
+    # Validate --prob against src/pgen/ only when it is given on the command line, so
+    # that --help and errors in other arguments do not need to scan the directory
+    def __call__(self, parser, namespace, values, option_string=None):
+        if values != self.default:
+            choices = pgen_choices()
+            if values not in choices:
+                raise argparse.ArgumentError(
+                    self, 'invalid choice: {0!r} (choose from {1})'
+                    .format(values, ', '.join(map(repr, choices))))
+        setattr(namespace, self.dest, values)
+
+
 parser.add_argument('--prob',
                     default='shock_tube',
-                    choices=pgen_choices,
-                    help='select problem generator')
+                    action=PgenAction,
+                    metavar='NAME',
+                    help='select problem generator (any src/pgen/NAME.cpp)')
 
 # --coord=[name] argument
 parser.add_argument(
@@ -358,233 +404,147 @@ parser.add_argument(
     action='append',
     help='name of library to link against (-l<lib>); can be specified multiple times')
 
-# Parse command-line inputs
-args = vars(parser.parse_args())
-
-# --- Step 2. Test for incompatible arguments ----------------------------
-
-# Set default flux; HLLD for MHD, HLLC for hydro, HLLE for isothermal hydro or any GR
-if args['flux'] == 'default':
-    if args['g']:
-        args['flux'] = 'hlle'
-    elif args['b']:
-        args['flux'] = 'hlld'
-    elif args['eos'] == 'isothermal':
-        args['flux'] = 'hlle'
-    else:
-        args['flux'] = 'hllc'
-
-# Check Riemann solver compatibility
-if args['flux'] == 'hllc' and args['eos'] == 'isothermal':
-    raise SystemExit('### CONFIGURE ERROR: HLLC flux cannot be used with isothermal EOS')
-if args['flux'] == 'hllc' and args['b']:
-    raise SystemExit('### CONFIGURE ERROR: HLLC flux cannot be used with MHD')
-if args['flux'] == 'lhllc' and args['eos'] == 'isothermal':
-    raise SystemExit('### CONFIGURE ERROR: LHLLC flux cannot be used with isothermal EOS') # noqa
-if args['flux'] == 'lhllc' and args['b']:
-    raise SystemExit('### CONFIGURE ERROR: LHLLC flux cannot be used with MHD')
-if args['flux'] == 'hlld' and not args['b']:
-    raise SystemExit('### CONFIGURE ERROR: HLLD flux can only be used with MHD')
-if args['flux'] == 'lhlld' and args['eos'] == 'isothermal':
-    raise SystemExit('### CONFIGURE ERROR: LHLLD flux cannot be used with isothermal EOS') # noqa
-if args['flux'] == 'lhlld' and not args['b']:
-    raise SystemExit('### CONFIGURE ERROR: LHLLD flux can only be used with MHD')
-
-# Check relativity
-if args['s'] and args['g']:
-    raise SystemExit('### CONFIGURE ERROR: '
-                     + 'GR implies SR; the -s option is restricted to pure SR')
-if args['t'] and not args['g']:
-    raise SystemExit('### CONFIGURE ERROR: Frame transformations only apply to GR')
-if args['g'] and not args['t'] and args['flux'] not in ('llf', 'hlle'):
-    raise SystemExit('### CONFIGURE ERROR: Frame transformations required for {0}'
-                     .format(args['flux']))
-if args['g'] and args['coord'] in ('cartesian', 'cylindrical', 'spherical_polar'):
-    raise SystemExit('### CONFIGURE ERROR: GR cannot be used with {0} coordinates'
-                     .format(args['coord']))
-if not args['g'] and args['coord'] not in ('cartesian', 'cylindrical', 'spherical_polar'):
-    raise SystemExit('### CONFIGURE ERROR: '
-                     + args['coord'] + ' coordinates only apply to GR')
-if args['eos'] == 'isothermal':
-    if args['s'] or args['g']:
-        raise SystemExit('### CONFIGURE ERROR: '
-                         + 'Isothermal EOS is incompatible with relativity')
-if args['eos'][:8] == 'general/':
-    if args['s'] or args['g']:
-        raise SystemExit('### CONFIGURE ERROR: '
-                         + 'General EOS is incompatible with relativity')
-    if args['flux'] not in ['hllc', 'hlld']:
-        raise SystemExit('### CONFIGURE ERROR: '
-                         + 'General EOS is incompatible with flux ' + args['flux'])
-
-if args['chemistry'] is None and args['chem_ode_solver'] is not None:
-    raise SystemExit('### CONFIGURE ERROR: must choose chemistry network for ode solver.')
-
-if args['chemistry'] is not None and args['chem_ode_solver'] is None:
-    raise SystemExit('### CONFIGURE ERROR: must choose ode solver for chemistry.')
-
-if args['chemistry'] == 'kida' and args['kida_rates'] is None:
-    raise SystemExit('### CONFIGURE ERROR: must provide rates for kida chemistry.')
-
-if args['chem_radiation'] == 'six_ray' and (
-        args['chemistry'] != 'gow17' and args['chemistry'] != 'kida'):
-    raise SystemExit('### CONFIGURE ERROR: six ray radiation'
-                     + 'only compatible with gow17 or kida chemistry enabled.')
-
-if args['chem_ode_solver'] == 'cvode' and args['cvode_path'] == '':
-    raise SystemExit('### CONFIGURE ERROR: must provide library path to cvode.')
-
-if args['g'] and (args['nr_radiation'] or args['implicit_radiation']):
-    raise SystemExit('### CONFIGURE ERROR: '
-                     + ' GR is incompatible with nr_radiation or implicit_radiation')
-
-if args['nr_radiation'] and args['implicit_radiation']:
-    raise SystemExit('### CONFIGURE ERROR: '
-                     + ' nr_radiation and implicit_radiation cannot be used together')
-
-# --- Step 3. Set definitions and Makefile options based on above argument
-
-# Prepare dictionaries of substitutions to be made
-definitions = {}
-makefile_options = {}
-makefile_options['LOADER_FLAGS'] = ''
-
-# --prob=[name] argument
-definitions['PROBLEM'] = makefile_options['PROBLEM_FILE'] = args['prob']
-
-# --coord=[name] argument
-definitions['COORDINATE_SYSTEM'] = makefile_options['COORDINATES_FILE'] = args['coord']
-
-# --eos=[name] argument
-definitions['NON_BAROTROPIC_EOS'] = '0' if args['eos'] == 'isothermal' else '1'
-makefile_options['EOS_FILE'] = args['eos']
-definitions['EQUATION_OF_STATE'] = args['eos']
-# set number of hydro variables for adiabatic/isothermal
-definitions['GENERAL_EOS'] = '0'
-makefile_options['GENERAL_EOS_FILE'] = 'noop'
-definitions['EOS_TABLE_ENABLED'] = '0'
-if args['eos'] == 'isothermal':
-    definitions['NHYDRO_VARIABLES'] = '4'
-elif args['eos'] == 'adiabatic':
-    definitions['NHYDRO_VARIABLES'] = '5'
-else:
-    definitions['GENERAL_EOS'] = '1'
-    makefile_options['GENERAL_EOS_FILE'] = 'general'
-    definitions['NHYDRO_VARIABLES'] = '5'
-    if args['eos'] == 'general/eos_table':
-        definitions['EOS_TABLE_ENABLED'] = '1'
+# Default flux for (-g, -b, isothermal EOS); HLLD for MHD, HLLC for hydro, HLLE for
+# isothermal hydro or any GR
+default_flux = {
+    (False, False, False): 'hllc',
+    (False, False, True): 'hlle',
+    (False, True, False): 'hlld',
+    (False, True, True): 'hlld',
+    (True, False, False): 'hlle',
+    (True, False, True): 'hlle',
+    (True, True, False): 'hlle',
+    (True, True, True): 'hlle',
+}
+
+# Incompatible arguments, checked in order; each message is formatted with the arguments
+incompatible_args = [
+    # Check Riemann solver compatibility
+    (lambda a: a['flux'] == 'hllc' and a['eos'] == 'isothermal',
+     'HLLC flux cannot be used with isothermal EOS'),
+    (lambda a: a['flux'] == 'hllc' and a['b'],
+     'HLLC flux cannot be used with MHD'),
+    (lambda a: a['flux'] == 'lhllc' and a['eos'] == 'isothermal',
+     'LHLLC flux cannot be used with isothermal EOS'),
+    (lambda a: a['flux'] == 'lhllc' and a['b'],
+     'LHLLC flux cannot be used with MHD'),
+    (lambda a: a['flux'] == 'hlld' and not a['b'],
+     'HLLD flux can only be used with MHD'),
+    (lambda a: a['flux'] == 'lhlld' and a['eos'] == 'isothermal',
+     'LHLLD flux cannot be used with isothermal EOS'),
+    (lambda a: a['flux'] == 'lhlld' and not a['b'],
+     'LHLLD flux can only be used with MHD'),
+    # Check relativity
+    (lambda a: a['s'] and a['g'],
+     'GR implies SR; the -s option is restricted to pure SR'),
+    (lambda a: a['t'] and not a['g'],
+     'Frame transformations only apply to GR'),
+    (lambda a: a['g'] and not a['t'] and a['flux'] not in ('llf', 'hlle'),
+     'Frame transformations required for {flux}'),
+    (lambda a: a['g'] and a['coord'] in ('cartesian', 'cylindrical', 'spherical_polar'),
+     'GR cannot be used with {coord} coordinates'),
+    (lambda a: (not a['g']
+                and a['coord'] not in ('cartesian', 'cylindrical', 'spherical_polar')),
+     '{coord} coordinates only apply to GR'),
+    (lambda a: a['eos'] == 'isothermal' and (a['s'] or a['g']),
+     'Isothermal EOS is incompatible with relativity'),
+    (lambda a: a['eos'][:8] == 'general/' and (a['s'] or a['g']),
+     'General EOS is incompatible with relativity'),
+    (lambda a: a['eos'][:8] == 'general/' and a['flux'] not in ['hllc', 'hlld'],
+     'General EOS is incompatible with flux {flux}'),
+    # Check chemistry
+    (lambda a: a['chemistry'] is None and a['chem_ode_solver'] is not None,
+     'must choose chemistry network for ode solver.'),
+    (lambda a: a['chemistry'] is not None and a['chem_ode_solver'] is None,
+     'must choose ode solver for chemistry.'),
+    (lambda a: a['chemistry'] == 'kida' and a['kida_rates'] is None,
+     'must provide rates for kida chemistry.'),
+    (lambda a: (a['chem_radiation'] == 'six_ray'
+                and a['chemistry'] != 'gow17' and a['chemistry'] != 'kida'),
+     'six ray radiation only compatible with gow17 or kida chemistry enabled.'),
+    (lambda a: a['chem_ode_solver'] == 'cvode' and a['cvode_path'] == '',
+     'must provide library path to cvode.'),
+    # Check radiation
+    (lambda a: a['g'] and (a['nr_radiation'] or a['implicit_radiation']),
+     ' GR is incompatible with nr_radiation or implicit_radiation'),
+    (lambda a: a['nr_radiation'] and a['implicit_radiation'],
+     ' nr_radiation and implicit_radiation cannot be used together'),
+]
 
-# --flux=[name] argument
-definitions['RSOLVER'] = makefile_options['RSOLVER_FILE'] = args['flux']
 
-# --nghost=[value] argument
-definitions['NUMBER_GHOST_CELLS'] = args['nghost']
-
-# --nscalars=[value] argument
-definitions['NUMBER_PASSIVE_SCALARS'] = args['nscalars']
-
-# --nspecies=[value] argument
-definitions['NUMBER_CHEMICAL_SPECIES'] = args['nspecies']
-
-# -b argument
-# set variety of macros based on whether MHD/hydro or adi/iso are defined
-if args['b']:
-    definitions['MAGNETIC_FIELDS_ENABLED'] = '1'
-    if definitions['GENERAL_EOS'] != '0':
-        makefile_options['GENERAL_EOS_FILE'] += '_mhd'
-    else:
-        makefile_options['EOS_FILE'] += '_mhd'
-    definitions['NFIELD_VARIABLES'] = '3'
-    makefile_options['RSOLVER_DIR'] = 'mhd/'
-    if args['flux'] == 'hlle' or args['flux'] == 'llf' or args['flux'] == 'roe':
-        makefile_options['RSOLVER_FILE'] += '_mhd'
-    if args['eos'] == 'isothermal':
-        definitions['NWAVE_VALUE'] = '6'
-        if args['flux'] == 'hlld':
-            makefile_options['RSOLVER_FILE'] += '_iso'
-    else:
-        definitions['NWAVE_VALUE'] = '7'
-else:
-    definitions['MAGNETIC_FIELDS_ENABLED'] = '0'
-    if definitions['GENERAL_EOS'] != '0':
-        makefile_options['GENERAL_EOS_FILE'] += '_hydro'
-    else:
-        makefile_options['EOS_FILE'] += '_hydro'
-    definitions['NFIELD_VARIABLES'] = '0'
-    makefile_options['RSOLVER_DIR'] = 'hydro/'
-    if args['eos'] == 'isothermal':
-        definitions['NWAVE_VALUE'] = '4'
-    else:
-        definitions['NWAVE_VALUE'] = '5'
-
-# -sts argument
-if args['sts']:
-    definitions['STS_ENABLED'] = '1'
-else:
-    definitions['STS_ENABLED'] = '0'
-
-# -s, -g, and -t arguments
-definitions['RELATIVISTIC_DYNAMICS'] = '1' if args['s'] or args['g'] else '0'
-definitions['GENERAL_RELATIVITY'] = '1' if args['g'] else '0'
-if args['s']:
-    makefile_options['EOS_FILE'] += '_sr'
-    if definitions['GENERAL_EOS'] != '0':
-        makefile_options['GENERAL_EOS_FILE'] += '_sr'
-    makefile_options['RSOLVER_FILE'] += '_rel'
-if args['g']:
-    makefile_options['EOS_FILE'] += '_gr'
-    if definitions['GENERAL_EOS'] != '0':
-        makefile_options['GENERAL_EOS_FILE'] += '_gr'
-    makefile_options['RSOLVER_FILE'] += '_rel'
-    if not args['t']:
-        makefile_options['RSOLVER_FILE'] += '_no_transform'
-
-
-# -radiation argument
-definitions['NRAD_VARIABLES'] = '0'
-
-if args['nr_radiation']:
-    definitions['NR_RADIATION_ENABLED'] = '1'
-    definitions['NRAD_VARIABLES'] = '14'
-else:
-    definitions['NR_RADIATION_ENABLED'] = '0'
-
-if args['implicit_radiation']:
-    definitions['IM_RADIATION_ENABLED'] = '1'
-    definitions['NRAD_VARIABLES'] = '14'
-else:
-    definitions['IM_RADIATION_ENABLED'] = '0'
-
-# -cr argument
-definitions['NCR_VARIABLES'] = '0'
-if args['cr']:
-    definitions['CR_ENABLED'] = '1'
-    definitions['NCR_VARIABLES'] = '4'
-else:
-    definitions['CR_ENABLED'] = '0'
-
-# -crdiff argument
-if args['crdiff']:
-    definitions['CRDIFFUSION_ENABLED'] = '1'
-else:
-    definitions['CRDIFFUSION_ENABLED'] = '0'
+# EOS and Riemann solver source files, named
+#   <eos>[_hydro|_mhd][_sr|_gr] (or general[_hydro|_mhd] plus <eos> for general EOS)
+#   <flux>[_mhd|_iso][_rel[_no_transform]]
+# Suffix for -b
+physics_suffixes = {False: '_hydro', True: '_mhd'}
+# Suffixes of the EOS and Riemann solver files for (-s, -g, -t)
+relativity_suffixes = {
+    (False, False, False): ('', ''),
+    (True, False, False): ('_sr', '_rel'),
+    (False, True, False): ('_gr', '_rel_no_transform'),
+    (False, True, True): ('_gr', '_rel'),
+}
+# Suffix of the MHD Riemann solver file for (--flux, isothermal EOS)
+mhd_rsolver_suffixes = {
+    ('hlle', False): '_mhd', ('hlle', True): '_mhd',
+    ('llf', False): '_mhd', ('llf', True): '_mhd',
+    ('roe', False): '_mhd', ('roe', True): '_mhd',
+    ('hlld', True): '_iso',
+}
 
 
 # --cxx=[name] argument
-if args['cxx'] == 'g++':
+# Each --cxx choice maps to a function that sets the default compiler command and flags
+# and returns the compiler-dependent options applied by the -debug, -coverage, -mpi,
+# -omp, and -hdf5 arguments below. A value of None marks an unsupported combination.
+gnu_features = {
+    'debug_flags': ['-O0 --std=c++11 -g'],  # -Og
+    'coverage_flags': ['-O0 -fprofile-arcs -ftest-coverage',
+                       '-fno-inline -fno-exceptions -fno-elide-constructors'],
+    'mpi_command': 'mpicxx',
+    'mpi_flags': [],
+    'omp_flags': ['-fopenmp'],
+    'omp_library_flags': [],
+    'omp_command_suffix': '',
+    'no_omp_flags': [],
+    'hdf5_preprocessor_flags': [],
+    'hdf5_linker_flags': [],
+    'hdf5_library_flags': ['-lhdf5'],
+}
+intel_features = dict(gnu_features,
+                      coverage_flags=['-O0 -prof-gen=srcpos'],
+                      omp_flags=['-qopenmp'],
+                      # suppressed messages:
+                      #   3180: pragma omp not recognized
+                      no_omp_flags=['-diag-disable 3180'])
+clang_features = dict(gnu_features,
+                      # Clang's "source-based" code coverage feature to produces
+                      # .profraw output (use --coverage to produce GCC-compatible
+                      # .gcno, .gcda output for gcov)
+                      coverage_flags=['-O0 -fprofile-instr-generate -fcoverage-mapping'])
+
+
+# Flags of each sort are collected in lists and joined once all arguments are processed
+def set_compiler(definitions, makefile_options, choice, command, compiler_flags,
+                 linker_flags=(), library_flags=()):
+    definitions['COMPILER_CHOICE'] = choice
+    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = command
+    makefile_options['PREPROCESSOR_FLAG_LIST'] = []
+    makefile_options['COMPILER_FLAG_LIST'] = [compiler_flags]
+    makefile_options['LINKER_FLAG_LIST'] = list(linker_flags)
+    makefile_options['LIBRARY_FLAG_LIST'] = list(library_flags)
+
+
+def setup_gxx(makefile_options, definitions, args):
     # GCC is C++11 feature-complete since v4.8.1 (2013-05-31)
-    definitions['COMPILER_CHOICE'] = 'g++'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'g++'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = '-O3 -std=c++11'
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'g++-simd':
+    set_compiler(definitions, makefile_options, 'g++', 'g++', '-O3 -std=c++11')
+    return gnu_features
+
+
+def setup_gxx_simd(makefile_options, definitions, args):
     # GCC version >= 4.9, for OpenMP 4.0; version >= 6.1 for OpenMP 4.5 support
-    definitions['COMPILER_CHOICE'] = 'g++-simd'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'g++'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = (
+    set_compiler(
+        definitions, makefile_options, 'g++-simd', 'g++',
         '-O3 -std=c++11 -fopenmp-simd -fwhole-program -flto -ffast-math '
         '-march=native -fprefetch-loop-arrays'
         # -march=skylake-avx512, skylake, core-avx2
@@ -593,71 +553,74 @@ if args['cxx'] == 'g++-simd':
         # -mprefer-avx128
         # -m64 (default)
     )
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'icpx':
+    return gnu_features
+
+
+def setup_icpx(makefile_options, definitions, args):
     # Next-gen LLVM-based Intel oneAPI DPC++/C++ Compiler
-    definitions['COMPILER_CHOICE'] = 'icpx'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'icpx'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
     # ICX drivers icx and icpx will accept ICC Classic Compiler options or Clang*/LLVM
     # Compiler options
-    makefile_options['COMPILER_FLAGS'] = (
-      '-O3 -std=c++11 -ipo -xhost -qopenmp-simd '
-      '-Wno-tautological-constant-compare -Wno-array-bounds'
+    set_compiler(
+        definitions, makefile_options, 'icpx', 'icpx',
+        '-O3 -std=c++11 -ipo -xhost -qopenmp-simd '
+        '-Wno-tautological-constant-compare -Wno-array-bounds'
     )
     # Currently unsupported, but "options to be supported" according to icpx
     # -qnextgen-diag: '-inline-forceinline -qopt-prefetch=4 '
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'icpc':
+    return dict(intel_features, no_omp_flags=[])
+
+
+def setup_icpc(makefile_options, definitions, args):
     # ICC is C++11 feature-complete since v15.0 (2014-08-26)
-    definitions['COMPILER_CHOICE'] = 'icpc'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'icpc'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = (
-      '-O3 -std=c++11 -ipo -xhost -inline-forceinline -qopenmp-simd -qopt-prefetch=4 '
-      '-qoverride-limits '  # -qopt-report-phase=ipo (does nothing without -ipo)
-      '-diag-disable=10441'  # The Intel(R) C++ Compiler Classic (ICC) is deprecated
+    set_compiler(
+        definitions, makefile_options, 'icpc', 'icpc',
+        '-O3 -std=c++11 -ipo -xhost -inline-forceinline -qopenmp-simd -qopt-prefetch=4 '
+        '-qoverride-limits '  # -qopt-report-phase=ipo (does nothing without -ipo)
+        '-diag-disable=10441'  # The Intel(R) C++ Compiler Classic (ICC) is deprecated
     )
     # -qopt-zmm-usage=high'  # typically harms multi-core performance on Skylake Xeon
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'icpc-debug':
+    return intel_features
+
+
+def setup_icpc_debug(makefile_options, definitions, args):
     # Disable IPO, forced inlining, and fast math. Enable vectorization reporting.
     # Useful for testing symmetry, SIMD-enabled functions and loops with OpenMP 4.5
-    definitions['COMPILER_CHOICE'] = 'icpc'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'icpc'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = (
-      '-O3 -std=c++11 -xhost -qopenmp-simd -fp-model precise -qopt-prefetch=4 '
-      '-qopt-report=5 -qopt-report-phase=openmp,vec -g -qoverride-limits '
-      '-diag-disable=10441'
+    set_compiler(
+        definitions, makefile_options, 'icpc', 'icpc',
+        '-O3 -std=c++11 -xhost -qopenmp-simd -fp-model precise -qopt-prefetch=4 '
+        '-qopt-report=5 -qopt-report-phase=openmp,vec -g -qoverride-limits '
+        '-diag-disable=10441'
     )
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'icpc-phi':
+    return intel_features
+
+
+def setup_icpc_phi(makefile_options, definitions, args):
     # Cross-compile for Intel Xeon Phi x200 KNL series (unique AVX-512ER and AVX-512FP)
     # -xMIC-AVX512: generate AVX-512F, AVX-512CD, AVX-512ER and AVX-512FP
-    definitions['COMPILER_CHOICE'] = 'icpc'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'icpc'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = (
-      '-O3 -std=c++11 -ipo -xMIC-AVX512 -inline-forceinline -qopenmp-simd '
-      '-qopt-prefetch=4 -qoverride-limits'
+    set_compiler(
+        definitions, makefile_options, 'icpc', 'icpc',
+        '-O3 -std=c++11 -ipo -xMIC-AVX512 -inline-forceinline -qopenmp-simd '
+        '-qopt-prefetch=4 -qoverride-limits'
     )
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'cray':
+    return dict(intel_features, debug_flags=['-O0 --std=c++11 -g -xMIC-AVX512'])
+
+
+def setup_cray(makefile_options, definitions, args):
     # Cray Compiling Environment 8.4 (2015-09-24) introduces C++11 feature completeness
     # (except "alignas"). v8.6 is C++14 feature-complete
-    definitions['COMPILER_CHOICE'] = 'cray'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'CC'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = '-O3 -h std=c++11 -h aggress -h vector3 -hfp3'
-    makefile_options['LINKER_FLAGS'] = '-hwp -hpl=obj/lib'
-    makefile_options['LIBRARY_FLAGS'] = '-lm'
-if args['cxx'] == 'bgxlc++':
+    set_compiler(definitions, makefile_options, 'cray', 'CC',
+                 '-O3 -h std=c++11 -h aggress -h vector3 -hfp3',
+                 linker_flags=['-hwp -hpl=obj/lib'], library_flags=['-lm'])
+    return dict(gnu_features,
+                debug_flags=['-O0 -h std=c++11'],
+                coverage_flags=None,
+                mpi_command=None,
+                mpi_flags=['-h mpi1'],
+                omp_flags=['-homp'],
+                no_omp_flags=['-hnoomp'])
+
+
+def setup_bgxlcxx(makefile_options, definitions, args):
     # IBM XL C/C++ for BG/Q is NOT C++11 feature-complete as of v12.1.0.15 (2017-12-22)
     # suppressed messages:
     #   1500-036:  The NOSTRICT option has the potential to alter the program's semantics
@@ -666,403 +629,589 @@ if args['cxx'] == 'bgxlc++':
     #   1586-233:  Duplicate definition of symbol ignored
     #   1586-267:  Inlining of specified subprogram failed due to the presence of a C++
     #                exception handler
-    definitions['COMPILER_CHOICE'] = 'bgxlc++'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'bgxlc++'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = (
+    compiler_flags = (
       '-O3 -qhot=level=1:vector -qinline=level=5:auto -qipa=level=1:noobject'
       ' -qstrict=subnormals -qmaxmem=150000 -qlanglvl=extended0x -qsuppress=1500-036'
       ' -qsuppress=1540-1401 -qsuppress=1586-083 -qsuppress=1586-233'
       ' -qsuppress=1586-267'
     )
-    makefile_options['LINKER_FLAGS'] = makefile_options['COMPILER_FLAGS']
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'clang++':
+    set_compiler(definitions, makefile_options, 'bgxlc++', 'bgxlc++', compiler_flags,
+                 linker_flags=[compiler_flags])
+    return dict(gnu_features,
+                debug_flags=['-O0 -g -qlanglvl=extended0x'],
+                coverage_flags=None,
+                mpi_command='mpixlcxx',
+                # use thread-safe version of compiler
+                omp_command_suffix='_r',
+                omp_flags=['-qsmp'],
+                hdf5_preprocessor_flags=[
+                    '-D_LARGEFILE_SOURCE -D_LARGEFILE64_SOURCE -D_BSD_SOURCE',
+                    '-I/soft/libraries/hdf5/1.10.0/cnk-xl/current/include',
+                    '-I/bgsys/drivers/ppcfloor/comm/include'],
+                hdf5_linker_flags=[
+                    '-L/soft/libraries/hdf5/1.10.0/cnk-xl/current/lib',
+                    '-L/soft/libraries/alcf/current/xl/ZLIB/lib'],
+                hdf5_library_flags=['-lhdf5 -lz -lm'])
+
+
+def setup_clangxx(makefile_options, definitions, args):
     # Clang is C++11 feature-complete since v3.3 (2013-06-17)
-    definitions['COMPILER_CHOICE'] = 'clang++'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'clang++'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = '-O3 -std=c++11'
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'clang++-simd':
+    set_compiler(definitions, makefile_options, 'clang++', 'clang++', '-O3 -std=c++11')
+    return clang_features
+
+
+def setup_clangxx_simd(makefile_options, definitions, args):
     # LLVM/Clang version >= 3.9 for most of OpenMP 4.0 and 4.5 (still incomplete; no
     # offloading, target/declare simd directives). OpenMP 3.1 fully supported in LLVM 3.7
-    definitions['COMPILER_CHOICE'] = 'clang++-simd'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'clang++'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = '-O3 -std=c++11 -fopenmp-simd'
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-if args['cxx'] == 'clang++-apple':
+    set_compiler(definitions, makefile_options, 'clang++-simd', 'clang++',
+                 '-O3 -std=c++11 -fopenmp-simd')
+    return clang_features
+
+
+def setup_clangxx_apple(makefile_options, definitions, args):
     # Apple LLVM/Clang: forked version of the open-source LLVM project bundled in macOS
-    definitions['COMPILER_CHOICE'] = 'clang++-apple'
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'clang++'
-    makefile_options['PREPROCESSOR_FLAGS'] = ''
-    makefile_options['COMPILER_FLAGS'] = '-O3 -std=c++11'
-    makefile_options['LINKER_FLAGS'] = ''
-    makefile_options['LIBRARY_FLAGS'] = ''
-
-# --chemistry=[network] argument
-makefile_options['CHEMISTRY_FILE'] = \
-    'src/chemistry/network_wrapper.cpp src/chemistry/utils/*.cpp'
-if args['chemistry'] is not None:
-    definitions['CHEMISTRY_ENABLED'] = '1'
-    definitions['CHEMNETWORK_HEADER'] = '../chemistry/network/' \
-                                        + args['chemistry'] + '.hpp'
-    makefile_options['CHEMNET_FILE'] = 'src/chemistry/network/' \
-        + args['chemistry'] + '.cpp'
-    # specify the number of species for each network
-    if args['chemistry'] == "gow17":
-        definitions['NUMBER_CHEMICAL_SPECIES'] = '12'
-    elif args['chemistry'] == "H2":
-        definitions['NUMBER_CHEMICAL_SPECIES'] = '2'
-    elif args['chemistry'] == "G14Sod":
-        definitions['NUMBER_CHEMICAL_SPECIES'] = '8'
-else:
-    definitions['CHEMISTRY_ENABLED'] = '0'
-    definitions['NUMBER_CHEMICAL_SPECIES'] = '0'
-    makefile_options['CHEMNET_FILE'] = ''
-    definitions['CHEMNETWORK_HEADER'] = '../chemistry/network/chem_network.hpp'
-
-# check number of species and scalars
-if definitions['NUMBER_PASSIVE_SCALARS'] == '0':
-    definitions['NUMBER_PASSIVE_SCALARS'] = definitions['NUMBER_CHEMICAL_SPECIES']
-elif int(definitions['NUMBER_PASSIVE_SCALARS']) < int(
-                                     definitions['NUMBER_CHEMICAL_SPECIES']):
-    raise SystemExit(
-      '### CONFIGURE ERROR: number of passive scalars ({:s})'.format(
-        definitions['NUMBER_PASSIVE_SCALARS'])
-      + ' less than the number of chemical species ({:s})!'.format(
-        definitions['NUMBER_CHEMICAL_SPECIES']))
-
-# --kida_rates=[rates] argument
-if args['kida_rates'] is not None:
-    if args['chemistry'] == "kida":
-        makefile_options['CHEMNET_FILE'] += (
-            ' src/chemistry/network/kida_network_files/'
-            + args['kida_rates']
-            + '/kida_'
-            + args['kida_rates']
-            + '.cpp')
-
-# --chem_ode_solver=[solver] argument
-if args['chem_ode_solver'] == 'cvode':
-    definitions['CVODE_OPTION'] = 'CVODE'
-    makefile_options['LIBRARY_FLAGS'] += ' -lsundials_cvode -lsundials_nvecserial'
-else:
-    definitions['CVODE_OPTION'] = 'NO_CVODE'
-if args['chem_ode_solver'] is not None:
-    makefile_options['CHEM_ODE_SOLVER_FILE'] = args['chem_ode_solver']+'.cpp'
-else:
-    makefile_options['CHEM_ODE_SOLVER_FILE'] = 'forward_euler.cpp'
-
-# --cvode_path=[path] argument
-if args['cvode_path'] != '':
-    makefile_options['PREPROCESSOR_FLAGS'] += '-I%s/include' % args['cvode_path']
-    makefile_options['LINKER_FLAGS'] += '-L%s/lib' % args['cvode_path']
-    makefile_options['LINKER_FLAGS'] += " -Wl,-rpath," + '%s/lib' % args['cvode_path']
-
-# --chem_radiation=[chem_radiation] argument
-if args['chem_radiation'] is not None:
-    definitions['CHEMRADIATION_ENABLED'] = '1'
-    makefile_options['CHEMRADIATION_FILE'] = args['chem_radiation']+'.cpp'
-    definitions['CHEMRADIATION_INTEGRATOR'] = args['chem_radiation']
-else:
-    definitions['CHEMRADIATION_ENABLED'] = '0'
-    makefile_options['CHEMRADIATION_FILE'] = 'const.cpp'
-    definitions['CHEMRADIATION_INTEGRATOR'] = 'none'
+    set_compiler(definitions, makefile_options, 'clang++-apple', 'clang++',
+                 '-O3 -std=c++11')
+    # Apple Clang disables the front end OpenMP driver interface; enable it via the
+    # preprocessor. Must install LLVM's OpenMP runtime library libomp beforehand
+    return dict(clang_features,
+                omp_flags=['-Xpreprocessor -fopenmp'],
+                omp_library_flags=['-lomp'])
+
+
+COMPILER_SETUPS = {
+    'g++': setup_gxx,
+    'g++-simd': setup_gxx_simd,
+    'icpx': setup_icpx,
+    'icpc': setup_icpc,
+    'icpc-debug': setup_icpc_debug,
+    'icpc-phi': setup_icpc_phi,
+    'cray': setup_cray,
+    'bgxlc++': setup_bgxlcxx,
+    'clang++': setup_clangxx,
+    'clang++-simd': setup_clangxx_simd,
+    'clang++-apple': setup_clangxx_apple,
+}
+
+
+# Leave an existing file untouched if its contents would not change, so that make does
+# not see a newer Makefile or defs.hpp after an identical reconfiguration
+def write_if_changed(filename, contents):
+    try:
+        with open(filename, 'r') as current_file:
+            if current_file.read() == contents:
+                return
+    except FileNotFoundError:
+        pass
+    with open(filename, 'w') as current_file:
+        current_file.write(contents)
+
+
+# Write a file of the configure cache under a temporary name and move it into place, so
+# that an interrupted or concurrent configuration never sees a partially written file
+def write_cache_file(filename, contents):
+    fd, temporary_name = tempfile.mkstemp(dir=os.path.dirname(filename))
+    try:
+        with os.fdopen(fd, 'w') as current_file:
+            current_file.write(contents)
+        os.replace(temporary_name, filename)
+    except BaseException:
+        os.remove(temporary_name)
+        raise
 
-# -float argument
-if args['float']:
-    definitions['SINGLE_PRECISION_ENABLED'] = '1'
-else:
-    definitions['SINGLE_PRECISION_ENABLED'] = '0'
 
-# -debug argument
-if args['debug']:
-    definitions['DEBUG_OPTION'] = '1'
-    # Completely replace the --cxx= sets of default compiler flags, disable optimization,
-    # and emit debug symbols in the compiled binaries
-    if (args['cxx'] == 'g++' or args['cxx'] == 'g++-simd'
-            or args['cxx'] == 'icpx'
-            or args['cxx'] == 'icpc' or args['cxx'] == 'icpc-debug'
-            or args['cxx'] == 'clang++' or args['cxx'] == 'clang++-simd'
-            or args['cxx'] == 'clang++-apple'):
-        makefile_options['COMPILER_FLAGS'] = '-O0 --std=c++11 -g'  # -Og
-    if args['cxx'] == 'cray':
-        makefile_options['COMPILER_FLAGS'] = '-O0 -h std=c++11'
-    if args['cxx'] == 'bgxlc++':
-        makefile_options['COMPILER_FLAGS'] = '-O0 -g -qlanglvl=extended0x'
-    if args['cxx'] == 'icpc-phi':
-        makefile_options['COMPILER_FLAGS'] = '-O0 --std=c++11 -g -xMIC-AVX512'
-else:
-    definitions['DEBUG_OPTION'] = '0'
+# To match show_config.cpp output: use 2 space indent for option, value string starts on
+# column 30
+def output_config(opt_descr, opt_choice, filehandle=None):
+    first_col_width = 32
+    first_col_indent = 2
+    descr_len = len(opt_descr)
+    right_pad_len = first_col_width - (descr_len + first_col_indent + 2)  # include colon
+    right_pad = right_pad_len*' ' if right_pad_len >= 0 else ''
+    line_str = first_col_indent*' ' + opt_descr + ': ' + right_pad + opt_choice
+    print(line_str)
+    if (filehandle is not None):
+        filehandle.write(line_str + '\n')
 
-# -coverage argument
-if args['coverage']:
-    definitions['EXCEPTION_HANDLING_OPTION'] = 'DISABLE_EXCEPTIONS'
-    # For now, append new compiler flags and don't override --cxx set, but set code to be
-    # unoptimized (-O0 instead of -O3) to get useful statement annotations. Should we add
-    # '-g -fopenmp-simd', by default? Don't combine lines when writing source code!
-    if (args['cxx'] == 'g++' or args['cxx'] == 'g++-simd'):
-        makefile_options['COMPILER_FLAGS'] += (
-            ' -O0 -fprofile-arcs -ftest-coverage'
-            ' -fno-inline -fno-exceptions -fno-elide-constructors'
-            )
-    if (args['cxx'] == 'icpc' or args['cxx'] == 'icpc-debug'
-            or args['cxx'] == 'icpx'
-            or args['cxx'] == 'icpc-phi'):
-        makefile_options['COMPILER_FLAGS'] += ' -O0 -prof-gen=srcpos'
-    if (args['cxx'] == 'clang++' or args['cxx'] == 'clang++-simd'
-            or args['cxx'] == 'clang++-apple'):
-        # Clang's "source-based" code coverage feature to produces .profraw output
-        makefile_options['COMPILER_FLAGS'] += (
-            ' -O0 -fprofile-instr-generate -fcoverage-mapping'
-            )  # use --coverage to produce GCC-compatible .gcno, .gcda output for gcov
-    if (args['cxx'] == 'cray' or args['cxx'] == 'bgxlc++'):
-        raise SystemExit(
-            '### CONFIGURE ERROR: No code coverage avaialbe for selected compiler!')
-else:
-    # Enable C++ try/throw/catch exception handling, by default. Disable only when testing
-    # code coverage, since it causes Gcov and other tools to report misleadingly low
-    # branch coverage statstics due to untested throwing of exceptions from function calls
-    definitions['EXCEPTION_HANDLING_OPTION'] = 'ENABLE_EXCEPTIONS'
 
-# --ccmd=[name] argument
-if args['ccmd'] is not None:
-    definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = args['ccmd']
+# Parse one command line (e.g. sys.argv[1:]) and prepare the contents of the output
+# files. Results are cached on the arguments, the modification times of the templates, and
+# the ATHENA_CONFIGURE_CACHE setting, so a process configuring the same build several
+# times (e.g. the regression tests) only prepares the files once. The returned
+# dictionaries must not be modified.
+@functools.lru_cache(maxsize=32)
+def configure_files(argv, template_mtimes, use_configure_cache):
+    # Parse command-line inputs
+    args = vars(parser.parse_args(argv))
 
-# --gcovcmd=[name] argument (only modifies Makefile target)
-if args['gcovcmd'] is not None:
-    makefile_options['GCOV_COMMAND'] = args['gcovcmd']
-else:
-    makefile_options['GCOV_COMMAND'] = 'gcov'
+    # --- Step 2. Test for incompatible arguments ----------------------------
 
-# -mpi argument
-if args['mpi']:
-    definitions['MPI_OPTION'] = 'MPI_PARALLEL'
-    if (args['cxx'] == 'g++' or args['cxx'] == 'icpc' or args['cxx'] == 'icpc-debug'
-            or args['cxx'] == 'icpx'
-            or args['cxx'] == 'icpc-phi' or args['cxx'] == 'g++-simd'
-            or args['cxx'] == 'clang++' or args['cxx'] == 'clang++-simd'
-            or args['cxx'] == 'clang++-apple'):
-        definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'mpicxx'
-    if args['cxx'] == 'cray':
-        makefile_options['COMPILER_FLAGS'] += ' -h mpi1'
-    if args['cxx'] == 'bgxlc++':
-        definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = 'mpixlcxx'  # noqa
-    # --mpiccmd=[name] argument
-    if args['mpiccmd'] is not None:
-        definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = args['mpiccmd']  # noqa
-else:
-    definitions['MPI_OPTION'] = 'NOT_MPI_PARALLEL'
+    if args['flux'] == 'default':
+        args['flux'] = default_flux[(args['g'], args['b'], args['eos'] == 'isothermal')]
 
-# -omp argument
-if args['omp']:
-    definitions['OPENMP_OPTION'] = 'OPENMP_PARALLEL'
-    if (args['cxx'] == 'g++' or args['cxx'] == 'g++-simd' or args['cxx'] == 'clang++'
-            or args['cxx'] == 'clang++-simd'):
-        makefile_options['COMPILER_FLAGS'] += ' -fopenmp'
-    if (args['cxx'] == 'clang++-apple'):
-        # Apple Clang disables the front end OpenMP driver interface; enable it via the
-        # preprocessor. Must install LLVM's OpenMP runtime library libomp beforehand
-        makefile_options['COMPILER_FLAGS'] += ' -Xpreprocessor -fopenmp'
-        makefile_options['LIBRARY_FLAGS'] += ' -lomp'
-    if (args['cxx'] == 'icpc' or args['cxx'] == 'icpc-debug' or args['cxx'] == 'icpc-phi'
-            or args['cxx'] == 'icpx'):
-        makefile_options['COMPILER_FLAGS'] += ' -qopenmp'
-    if args['cxx'] == 'cray':
-        makefile_options['COMPILER_FLAGS'] += ' -homp'
-    if args['cxx'] == 'bgxlc++':
-        # use thread-safe version of compiler
-        definitions['COMPILER_COMMAND'] += '_r'
-        makefile_options['COMPILER_COMMAND'] += '_r'
-        makefile_options['COMPILER_FLAGS'] += ' -qsmp'
-else:
-    definitions['OPENMP_OPTION'] = 'NOT_OPENMP_PARALLEL'
-    if args['cxx'] == 'cray':
-        makefile_options['COMPILER_FLAGS'] += ' -hnoomp'
-    if (args['cxx'] == 'icpc' or args['cxx'] == 'icpc-debug'
-            or args['cxx'] == 'icpc-phi'):
-        # suppressed messages:
-        #   3180: pragma omp not recognized
-        makefile_options['COMPILER_FLAGS'] += ' -diag-disable 3180'
-
-# --grav argument
-if args['grav'] == "none":
-    definitions['SELF_GRAVITY_ENABLED'] = '0'
-else:
-    if args['grav'] == "fft":
-        definitions['SELF_GRAVITY_ENABLED'] = '1'
-        if not args['fft']:
-            raise SystemExit(
-                '### CONFIGURE ERROR: FFT Poisson solver only be used with FFT')
-    if args['grav'] == "mg":
-        definitions['SELF_GRAVITY_ENABLED'] = '2'
+    for incompatible, message in incompatible_args:
+        if incompatible(args):
+            raise SystemExit('### CONFIGURE ERROR: ' + message.format(**args))
 
+    # --- Step 3. Set definitions and Makefile options based on above argument
 
-# -fft argument
-makefile_options['MPIFFT_FILE'] = ' '
-definitions['FFT_OPTION'] = 'NO_FFT'
-if args['fft']:
-    definitions['FFT_OPTION'] = 'FFT'
-    if args['fftw_path'] != '':
-        makefile_options['PREPROCESSOR_FLAGS'] += ' -I{0}/include'.format(
-            args['fftw_path'])
-        makefile_options['LINKER_FLAGS'] += ' -L{0}/lib'.format(args['fftw_path'])
-    if args['omp']:
-        makefile_options['LIBRARY_FLAGS'] += ' -lfftw3_omp'
-    if args['mpi']:
-        makefile_options['MPIFFT_FILE'] = ' $(wildcard src/fft/plimpton/*.cpp)'
-    makefile_options['LIBRARY_FLAGS'] += ' -lfftw3'
+    # Prepare dictionaries of substitutions to be made
+    definitions = {}
+    makefile_options = {}
+    makefile_options['LOADER_FLAGS'] = ''
 
-# -hdf5 argument
-if args['hdf5']:
-    definitions['HDF5_OPTION'] = 'HDF5OUTPUT'
-
-    if args['hdf5_path'] != '':
-        makefile_options['PREPROCESSOR_FLAGS'] += ' -I{0}/include'.format(
-            args['hdf5_path'])
-        makefile_options['LINKER_FLAGS'] += ' -L{0}/lib'.format(args['hdf5_path'])
-    if (args['cxx'] == 'g++' or args['cxx'] == 'g++-simd'
-            or args['cxx'] == 'cray' or args['cxx'] == 'icpc'
-            or args['cxx'] == 'icpx'
-            or args['cxx'] == 'icpc-debug' or args['cxx'] == 'icpc-phi'
-            or args['cxx'] == 'clang++' or args['cxx'] == 'clang++-simd'
-            or args['cxx'] == 'clang++-apple'):
-        makefile_options['LIBRARY_FLAGS'] += ' -lhdf5'
-    if args['cxx'] == 'bgxlc++':
-        makefile_options['PREPROCESSOR_FLAGS'] += (
-            ' -D_LARGEFILE_SOURCE -D_LARGEFILE64_SOURCE -D_BSD_SOURCE'
-            ' -I/soft/libraries/hdf5/1.10.0/cnk-xl/current/include'
-            ' -I/bgsys/drivers/ppcfloor/comm/include')
-        makefile_options['LINKER_FLAGS'] += (
-            ' -L/soft/libraries/hdf5/1.10.0/cnk-xl/current/lib'
-            ' -L/soft/libraries/alcf/current/xl/ZLIB/lib')
-        makefile_options['LIBRARY_FLAGS'] += ' -lhdf5 -lz -lm'
-else:
-    definitions['HDF5_OPTION'] = 'NO_HDF5OUTPUT'
-
-# -h5double argument (does nothing if no -hdf5)
-if args['h5double']:
-    definitions['H5_DOUBLE_PRECISION_ENABLED'] = '1'
-else:
-    definitions['H5_DOUBLE_PRECISION_ENABLED'] = '0'
+    # --prob=[name] argument
+    definitions['PROBLEM'] = makefile_options['PROBLEM_FILE'] = args['prob']
 
-# --cflag=[string] argument
-if args['cflag'] is not None:
-    makefile_options['COMPILER_FLAGS'] += ' '+args['cflag']
+    # --coord=[name] argument
+    definitions['COORDINATE_SYSTEM'] = makefile_options['COORDINATES_FILE'] = \
+        args['coord']
 
-# --include=[name] arguments
-for include_path in args['include']:
-    makefile_options['COMPILER_FLAGS'] += ' -I'+include_path
+    # --eos=[name] argument
+    definitions['NON_BAROTROPIC_EOS'] = '0' if args['eos'] == 'isothermal' else '1'
+    definitions['EQUATION_OF_STATE'] = args['eos']
+    # set number of hydro variables for adiabatic/isothermal
+    definitions['GENERAL_EOS'] = '0'
+    definitions['EOS_TABLE_ENABLED'] = '0'
+    if args['eos'] == 'isothermal':
+        definitions['NHYDRO_VARIABLES'] = '4'
+    elif args['eos'] == 'adiabatic':
+        definitions['NHYDRO_VARIABLES'] = '5'
+    else:
+        definitions['GENERAL_EOS'] = '1'
+        definitions['NHYDRO_VARIABLES'] = '5'
+        if args['eos'] == 'general/eos_table':
+            definitions['EOS_TABLE_ENABLED'] = '1'
+
+    # --flux=[name] argument
+    definitions['RSOLVER'] = args['flux']
+
+    # --nghost=[value] argument
+    definitions['NUMBER_GHOST_CELLS'] = args['nghost']
+
+    # --nscalars=[value] argument
+    definitions['NUMBER_PASSIVE_SCALARS'] = args['nscalars']
+
+    # --nspecies=[value] argument
+    definitions['NUMBER_CHEMICAL_SPECIES'] = args['nspecies']
+
+    # -b argument
+    # set variety of macros based on whether MHD/hydro or adi/iso are defined
+    if args['b']:
+        definitions['MAGNETIC_FIELDS_ENABLED'] = '1'
+        definitions['NFIELD_VARIABLES'] = '3'
+        makefile_options['RSOLVER_DIR'] = 'mhd/'
+        if args['eos'] == 'isothermal':
+            definitions['NWAVE_VALUE'] = '6'
+        else:
+            definitions['NWAVE_VALUE'] = '7'
+    else:
+        definitions['MAGNETIC_FIELDS_ENABLED'] = '0'
+        definitions['NFIELD_VARIABLES'] = '0'
+        makefile_options['RSOLVER_DIR'] = 'hydro/'
+        if args['eos'] == 'isothermal':
+            definitions['NWAVE_VALUE'] = '4'
+        else:
+            definitions['NWAVE_VALUE'] = '5'
+
+    # -sts argument
+    if args['sts']:
+        definitions['STS_ENABLED'] = '1'
+    else:
+        definitions['STS_ENABLED'] = '0'
 
-# --lib_path=[name] arguments
-for library_path in args['lib_path']:
-    makefile_options['LINKER_FLAGS'] += ' -L'+library_path
+    # -s, -g, and -t arguments
+    definitions['RELATIVISTIC_DYNAMICS'] = '1' if args['s'] or args['g'] else '0'
+    definitions['GENERAL_RELATIVITY'] = '1' if args['g'] else '0'
 
-# --lib=[name] arguments
-for library_name in args['lib']:
-    makefile_options['LIBRARY_FLAGS'] += ' -l'+library_name
-
-# Assemble all flags of any sort given to compiler
-definitions['COMPILER_FLAGS'] = ' '.join(
-    [makefile_options[opt+'_FLAGS'] for opt in
-     ['PREPROCESSOR', 'COMPILER', 'LINKER', 'LIBRARY']])
-
-# --- Step 4. Create new files, finish up --------------------------------
-
-# Terminate all filenames with .cpp extension
-makefile_options['PROBLEM_FILE'] += '.cpp'
-makefile_options['COORDINATES_FILE'] += '.cpp'
-makefile_options['EOS_FILE'] += '.cpp'
-makefile_options['GENERAL_EOS_FILE'] += '.cpp'
-makefile_options['RSOLVER_FILE'] += '.cpp'
-
-# Read templates
-with open(defsfile_input, 'r') as current_file:
-    defsfile_template = current_file.read()
-with open(makefile_input, 'r') as current_file:
-    makefile_template = current_file.read()
-
-# Make substitutions
-for key, val in definitions.items():
-    defsfile_template = re.sub(r'@{0}@'.format(key), val, defsfile_template)
-for key, val in makefile_options.items():
-    makefile_template = re.sub(r'@{0}@'.format(key), val, makefile_template)
-
-# Write output files
-with open(defsfile_output, 'w') as current_file:
-    current_file.write(defsfile_template)
-with open(makefile_output, 'w') as current_file:
-    current_file.write(makefile_template)
-
-# Finish with diagnostic output
-# To match show_config.cpp output: use 2 space indent for option, value string starts on
-# column 30
-self_grav_string = 'OFF'
-if args['grav'] == 'fft':
-    self_grav_string = 'FFT'
-elif args['grav'] == 'mg':
-    self_grav_string = 'Multigrid'
+    physics_suffix = physics_suffixes[args['b']]
+    eos_suffix, rsolver_suffix = relativity_suffixes[(args['s'], args['g'], args['t'])]
+    if args['b']:
+        rsolver_suffix = mhd_rsolver_suffixes.get(
+            (args['flux'], args['eos'] == 'isothermal'), '') + rsolver_suffix
+    if definitions['GENERAL_EOS'] != '0':
+        makefile_options['EOS_FILE'] = args['eos'] + eos_suffix
+        makefile_options['GENERAL_EOS_FILE'] = 'general' + physics_suffix + eos_suffix
+    else:
+        makefile_options['EOS_FILE'] = args['eos'] + physics_suffix + eos_suffix
+        makefile_options['GENERAL_EOS_FILE'] = 'noop'
+    makefile_options['RSOLVER_FILE'] = args['flux'] + rsolver_suffix
 
+    # -radiation argument
+    definitions['NRAD_VARIABLES'] = '0'
 
-def output_config(opt_descr, opt_choice, filehandle=None):
-    first_col_width = 32
-    first_col_indent = 2
-    descr_len = len(opt_descr)
-    right_pad_len = first_col_width - (descr_len + first_col_indent + 2)  # include colon
-    right_pad = right_pad_len*' ' if right_pad_len >= 0 else ''
-    line_str = first_col_indent*' ' + opt_descr + ': ' + right_pad + opt_choice
-    print(line_str)
-    if (filehandle is not None):
-        filehandle.write(line_str + '\n')
+    if args['nr_radiation']:
+        definitions['NR_RADIATION_ENABLED'] = '1'
+        definitions['NRAD_VARIABLES'] = '14'
+    else:
+        definitions['NR_RADIATION_ENABLED'] = '0'
+
+    if args['implicit_radiation']:
+        definitions['IM_RADIATION_ENABLED'] = '1'
+        definitions['NRAD_VARIABLES'] = '14'
+    else:
+        definitions['IM_RADIATION_ENABLED'] = '0'
 
+    # -cr argument
+    definitions['NCR_VARIABLES'] = '0'
+    if args['cr']:
+        definitions['CR_ENABLED'] = '1'
+        definitions['NCR_VARIABLES'] = '4'
+    else:
+        definitions['CR_ENABLED'] = '0'
 
-# write the configuration optitions into a log file
-flog = open('./configure.log', 'w')
-
-output_config('Your Athena++ distribution has now been configured with the following options', '', flog)  # noqa
-output_config('Problem generator', args['prob'], flog)
-output_config('Coordinate system', args['coord'], flog)
-output_config('Equation of state', args['eos'], flog)
-output_config('Riemann solver', args['flux'], flog)
-output_config('Magnetic fields', ('ON' if args['b'] else 'OFF'), flog)
-output_config('Number of scalars', definitions['NUMBER_PASSIVE_SCALARS'], flog)
-output_config('Number of chemical species', definitions['NUMBER_CHEMICAL_SPECIES'], flog)
-output_config('Special relativity', ('ON' if args['s'] else 'OFF'), flog)
-output_config('General relativity', ('ON' if args['g'] else 'OFF'), flog)
-output_config('Radiative Transfer', ('ON' if args['nr_radiation'] else 'OFF'), flog)
-output_config('Implicit Radiation', ('ON' if args['implicit_radiation'] else 'OFF'), flog)
-output_config('Cosmic Ray Transport', ('ON' if args['cr'] else 'OFF'), flog)
-output_config('Cosmic Ray Diffusion', ('ON' if args['crdiff'] else 'OFF'), flog)
-output_config('Frame transformations', ('ON' if args['t'] else 'OFF'), flog)
-output_config('Self-Gravity', self_grav_string, flog)
-output_config('Super-Time-Stepping', ('ON' if args['sts'] else 'OFF'), flog)
-output_config('Chemistry', (args['chemistry']
-                            if args['chemistry'] is not None else 'OFF'), flog)
-output_config('KIDA rates', (args['kida_rates']
-                             if args['kida_rates'] is not None else 'OFF'), flog)
-output_config('ChemRadiation', (args['chem_radiation']
-                                if args['chem_radiation'] is not None else 'OFF'), flog)
-output_config('chem_ode_solver', (args['chem_ode_solver'] if args['chem_ode_solver']
-                                  is not None else 'OFF'), flog)
-output_config('Debug flags', ('ON' if args['debug'] else 'OFF'), flog)
-output_config('Code coverage flags', ('ON' if args['coverage'] else 'OFF'), flog)
-output_config('Linker flags', makefile_options['LINKER_FLAGS'] + ' '
-              + makefile_options['LIBRARY_FLAGS'], flog)
-output_config('Floating-point precision', ('single' if args['float'] else 'double'), flog)
-output_config('Number of ghost cells', args['nghost'], flog)
-output_config('MPI parallelism', ('ON' if args['mpi'] else 'OFF'), flog)
-output_config('OpenMP parallelism', ('ON' if args['omp'] else 'OFF'), flog)
-output_config('FFT', ('ON' if args['fft'] else 'OFF'), flog)
-output_config('HDF5 output', ('ON' if args['hdf5'] else 'OFF'), flog)
-if args['hdf5']:
-    output_config('HDF5 precision', ('double' if args['h5double'] else 'single'), flog)
-output_config('Compiler', args['cxx'], flog)
-output_config('Compilation command', makefile_options['COMPILER_COMMAND'] + ' '
-              + makefile_options['PREPROCESSOR_FLAGS'] + ' '
-              + makefile_options['COMPILER_FLAGS'], flog)
-
-flog.close()
+    # -crdiff argument
+    if args['crdiff']:
+        definitions['CRDIFFUSION_ENABLED'] = '1'
+    else:
+        definitions['CRDIFFUSION_ENABLED'] = '0'
+
+    # --cxx=[name] argument
+    compiler_features = COMPILER_SETUPS[args['cxx']](makefile_options, definitions, args)
+
+    # --chemistry=[network] argument
+    makefile_options['CHEMISTRY_FILE'] = \
+        'src/chemistry/network_wrapper.cpp src/chemistry/utils/*.cpp'
+    if args['chemistry'] is not None:
+        definitions['CHEMISTRY_ENABLED'] = '1'
+        definitions['CHEMNETWORK_HEADER'] = '../chemistry/network/' \
+                                            + args['chemistry'] + '.hpp'
+        makefile_options['CHEMNET_FILE'] = 'src/chemistry/network/' \
+            + args['chemistry'] + '.cpp'
+        # specify the number of species for each network
+        if args['chemistry'] == "gow17":
+            definitions['NUMBER_CHEMICAL_SPECIES'] = '12'
+        elif args['chemistry'] == "H2":
+            definitions['NUMBER_CHEMICAL_SPECIES'] = '2'
+        elif args['chemistry'] == "G14Sod":
+            definitions['NUMBER_CHEMICAL_SPECIES'] = '8'
+    else:
+        definitions['CHEMISTRY_ENABLED'] = '0'
+        definitions['NUMBER_CHEMICAL_SPECIES'] = '0'
+        makefile_options['CHEMNET_FILE'] = ''
+        definitions['CHEMNETWORK_HEADER'] = '../chemistry/network/chem_network.hpp'
+
+    # check number of species and scalars
+    if definitions['NUMBER_PASSIVE_SCALARS'] == '0':
+        definitions['NUMBER_PASSIVE_SCALARS'] = definitions['NUMBER_CHEMICAL_SPECIES']
+    elif int(definitions['NUMBER_PASSIVE_SCALARS']) < int(
+                                         definitions['NUMBER_CHEMICAL_SPECIES']):
+        raise SystemExit(
+          '### CONFIGURE ERROR: number of passive scalars ({:s})'.format(
+            definitions['NUMBER_PASSIVE_SCALARS'])
+          + ' less than the number of chemical species ({:s})!'.format(
+            definitions['NUMBER_CHEMICAL_SPECIES']))
+
+    # --kida_rates=[rates] argument
+    if args['kida_rates'] is not None:
+        if args['chemistry'] == "kida":
+            makefile_options['CHEMNET_FILE'] += (
+                ' src/chemistry/network/kida_network_files/'
+                + args['kida_rates']
+                + '/kida_'
+                + args['kida_rates']
+                + '.cpp')
+
+    # --chem_ode_solver=[solver] argument
+    if args['chem_ode_solver'] == 'cvode':
+        definitions['CVODE_OPTION'] = 'CVODE'
+        makefile_options['LIBRARY_FLAG_LIST'].append(
+            '-lsundials_cvode -lsundials_nvecserial')
+    else:
+        definitions['CVODE_OPTION'] = 'NO_CVODE'
+    if args['chem_ode_solver'] is not None:
+        makefile_options['CHEM_ODE_SOLVER_FILE'] = args['chem_ode_solver']+'.cpp'
+    else:
+        makefile_options['CHEM_ODE_SOLVER_FILE'] = 'forward_euler.cpp'
+
+    # --cvode_path=[path] argument
+    if args['cvode_path'] != '':
+        makefile_options['PREPROCESSOR_FLAG_LIST'].append(
+            '-I%s/include' % args['cvode_path'])
+        makefile_options['LINKER_FLAG_LIST'].extend(
+            ['-L%s/lib' % args['cvode_path'],
+             "-Wl,-rpath," + '%s/lib' % args['cvode_path']])
+
+    # --chem_radiation=[chem_radiation] argument
+    if args['chem_radiation'] is not None:
+        definitions['CHEMRADIATION_ENABLED'] = '1'
+        makefile_options['CHEMRADIATION_FILE'] = args['chem_radiation']+'.cpp'
+        definitions['CHEMRADIATION_INTEGRATOR'] = args['chem_radiation']
+    else:
+        definitions['CHEMRADIATION_ENABLED'] = '0'
+        makefile_options['CHEMRADIATION_FILE'] = 'const.cpp'
+        definitions['CHEMRADIATION_INTEGRATOR'] = 'none'
+
+    # -float argument
+    if args['float']:
+        definitions['SINGLE_PRECISION_ENABLED'] = '1'
+    else:
+        definitions['SINGLE_PRECISION_ENABLED'] = '0'
+
+    # -debug argument
+    if args['debug']:
+        definitions['DEBUG_OPTION'] = '1'
+        # Completely replace the --cxx= sets of default compiler flags, disable
+        # optimization, and emit debug symbols in the compiled binaries
+        makefile_options['COMPILER_FLAG_LIST'] = list(compiler_features['debug_flags'])
+    else:
+        definitions['DEBUG_OPTION'] = '0'
+
+    # -coverage argument
+    if args['coverage']:
+        definitions['EXCEPTION_HANDLING_OPTION'] = 'DISABLE_EXCEPTIONS'
+        # For now, append new compiler flags and don't override --cxx set, but set code to
+        # be unoptimized (-O0 instead of -O3) to get useful statement annotations. Should
+        # we add '-g -fopenmp-simd', by default? Don't combine lines when writing source
+        # code!
+        if compiler_features['coverage_flags'] is None:
+            raise SystemExit(
+                '### CONFIGURE ERROR: No code coverage avaialbe for selected compiler!')
+        makefile_options['COMPILER_FLAG_LIST'].extend(compiler_features['coverage_flags'])
+    else:
+        # Enable C++ try/throw/catch exception handling, by default. Disable only when
+        # testing code coverage, since it causes Gcov and other tools to report
+        # misleadingly low branch coverage statstics due to untested throwing of
+        # exceptions from function calls
+        definitions['EXCEPTION_HANDLING_OPTION'] = 'ENABLE_EXCEPTIONS'
+
+    # --ccmd=[name] argument
+    if args['ccmd'] is not None:
+        definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = \
+            args['ccmd']
+
+    # --gcovcmd=[name] argument (only modifies Makefile target)
+    if args['gcovcmd'] is not None:
+        makefile_options['GCOV_COMMAND'] = args['gcovcmd']
+    else:
+        makefile_options['GCOV_COMMAND'] = 'gcov'
+
+    # -mpi argument
+    if args['mpi']:
+        definitions['MPI_OPTION'] = 'MPI_PARALLEL'
+        if compiler_features['mpi_command'] is not None:
+            definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = \
+                compiler_features['mpi_command']
+        makefile_options['COMPILER_FLAG_LIST'].extend(compiler_features['mpi_flags'])
+        # --mpiccmd=[name] argument
+        if args['mpiccmd'] is not None:
+            definitions['COMPILER_COMMAND'] = makefile_options['COMPILER_COMMAND'] = args['mpiccmd']  # noqa
+    else:
+        definitions['MPI_OPTION'] = 'NOT_MPI_PARALLEL'
+
+    # -omp argument
+    if args['omp']:
+        definitions['OPENMP_OPTION'] = 'OPENMP_PARALLEL'
+        definitions['COMPILER_COMMAND'] += compiler_features['omp_command_suffix']
+        makefile_options['COMPILER_COMMAND'] += compiler_features['omp_command_suffix']
+        makefile_options['COMPILER_FLAG_LIST'].extend(compiler_features['omp_flags'])
+        makefile_options['LIBRARY_FLAG_LIST'].extend(
+            compiler_features['omp_library_flags'])
+    else:
+        definitions['OPENMP_OPTION'] = 'NOT_OPENMP_PARALLEL'
+        makefile_options['COMPILER_FLAG_LIST'].extend(compiler_features['no_omp_flags'])
+
+    # --grav argument
+    if args['grav'] == "none":
+        definitions['SELF_GRAVITY_ENABLED'] = '0'
+    else:
+        if args['grav'] == "fft":
+            definitions['SELF_GRAVITY_ENABLED'] = '1'
+            if not args['fft']:
+                raise SystemExit(
+                    '### CONFIGURE ERROR: FFT Poisson solver only be used with FFT')
+        if args['grav'] == "mg":
+            definitions['SELF_GRAVITY_ENABLED'] = '2'
+
+    # -fft argument
+    makefile_options['MPIFFT_FILE'] = ' '
+    definitions['FFT_OPTION'] = 'NO_FFT'
+    if args['fft']:
+        definitions['FFT_OPTION'] = 'FFT'
+        if args['fftw_path'] != '':
+            makefile_options['PREPROCESSOR_FLAG_LIST'].append('-I{0}/include'.format(
+                args['fftw_path']))
+            makefile_options['LINKER_FLAG_LIST'].append(
+                '-L{0}/lib'.format(args['fftw_path']))
+        if args['omp']:
+            makefile_options['LIBRARY_FLAG_LIST'].append('-lfftw3_omp')
+        if args['mpi']:
+            makefile_options['MPIFFT_FILE'] = ' $(wildcard src/fft/plimpton/*.cpp)'
+        makefile_options['LIBRARY_FLAG_LIST'].append('-lfftw3')
+
+    # -hdf5 argument
+    if args['hdf5']:
+        definitions['HDF5_OPTION'] = 'HDF5OUTPUT'
+
+        if args['hdf5_path'] != '':
+            makefile_options['PREPROCESSOR_FLAG_LIST'].append('-I{0}/include'.format(
+                args['hdf5_path']))
+            makefile_options['LINKER_FLAG_LIST'].append(
+                '-L{0}/lib'.format(args['hdf5_path']))
+        makefile_options['PREPROCESSOR_FLAG_LIST'].extend(
+            compiler_features['hdf5_preprocessor_flags'])
+        makefile_options['LINKER_FLAG_LIST'].extend(
+            compiler_features['hdf5_linker_flags'])
+        makefile_options['LIBRARY_FLAG_LIST'].extend(
+            compiler_features['hdf5_library_flags'])
+    else:
+        definitions['HDF5_OPTION'] = 'NO_HDF5OUTPUT'
+
+    # -h5double argument (does nothing if no -hdf5)
+    if args['h5double']:
+        definitions['H5_DOUBLE_PRECISION_ENABLED'] = '1'
+    else:
+        definitions['H5_DOUBLE_PRECISION_ENABLED'] = '0'
+
+    # --cflag=[string] argument
+    if args['cflag'] is not None:
+        makefile_options['COMPILER_FLAG_LIST'].append(args['cflag'])
+
+    # --include=[name] arguments
+    makefile_options['COMPILER_FLAG_LIST'].extend(
+        '-I'+include_path for include_path in args['include'])
+
+    # --lib_path=[name] arguments
+    makefile_options['LINKER_FLAG_LIST'].extend(
+        '-L'+library_path for library_path in args['lib_path'])
+
+    # --lib=[name] arguments
+    makefile_options['LIBRARY_FLAG_LIST'].extend(
+        '-l'+library_name for library_name in args['lib'])
+
+    # Join each sort of flags, then assemble all flags of any sort given to compiler
+    for opt in ['PREPROCESSOR', 'COMPILER', 'LINKER', 'LIBRARY']:
+        makefile_options[opt+'_FLAGS'] = ' '.join(makefile_options.pop(opt+'_FLAG_LIST'))
+    definitions['COMPILER_FLAGS'] = ' '.join(
+        [makefile_options[opt+'_FLAGS'] for opt in
+         ['PREPROCESSOR', 'COMPILER', 'LINKER', 'LIBRARY']])
+
+    # --- Step 4. Create new files, finish up --------------------------------
+
+    # Terminate all filenames with .cpp extension
+    makefile_options['PROBLEM_FILE'] += '.cpp'
+    makefile_options['COORDINATES_FILE'] += '.cpp'
+    makefile_options['EOS_FILE'] += '.cpp'
+    makefile_options['GENERAL_EOS_FILE'] += '.cpp'
+    makefile_options['RSOLVER_FILE'] += '.cpp'
+
+    # Optionally reuse the files generated by an identical configuration on this machine,
+    # enabled by setting ATHENA_CONFIGURE_CACHE=1. The key covers every substitution, the
+    # host architecture, and the modification times of the templates. The Makefile is
+    # stored last, so its presence marks a complete entry.
+    configure_cache_dir = None
+    if use_configure_cache:
+        configure_cache_key = hashlib.sha1(json.dumps(
+            [definitions, makefile_options, platform.machine(), list(template_mtimes)],
+            sort_keys=True).encode()).hexdigest()
+        configure_cache_dir = os.path.join(
+            os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+            'athena_configure', configure_cache_key)
+    cached_defsfile = cached_makefile = None
+    if configure_cache_dir is not None:
+        cached_defsfile = os.path.join(configure_cache_dir, 'defs.hpp')
+        cached_makefile = os.path.join(configure_cache_dir, 'Makefile')
+
+    if cached_makefile is not None and os.path.isfile(cached_makefile):
+        with open(cached_defsfile, 'r') as current_file:
+            defsfile_template = current_file.read()
+        with open(cached_makefile, 'r') as current_file:
+            makefile_template = current_file.read()
+    else:
+        # Read templates
+        defsfile_template = read_template(defsfile_input)
+        makefile_template = read_template(makefile_input)
+
+        # Make substitutions in a single pass over each template; unknown @TAG@ tokens are
+        # kept
+        defsfile_template = template_token.sub(
+            lambda match: definitions.get(match.group(1), match.group(0)),
+            defsfile_template)
+        makefile_template = template_token.sub(
+            lambda match: makefile_options.get(match.group(1), match.group(0)),
+            makefile_template)
+
+        if configure_cache_dir is not None:
+            os.makedirs(configure_cache_dir, exist_ok=True)
+            write_cache_file(cached_defsfile, defsfile_template)
+            write_cache_file(cached_makefile, makefile_template)
+
+    return args, definitions, makefile_options, defsfile_template, makefile_template
+
+
+# Configure Athena++ for the given command line; the output files are rewritten
+# (if changed) on every call, since another configuration may have replaced them
+def configure_main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    args, definitions, makefile_options, defsfile_template, makefile_template = \
+        configure_files(tuple(argv),
+                        tuple(os.stat(name).st_mtime_ns
+                              for name in (defsfile_input, makefile_input)),
+                        os.environ.get('ATHENA_CONFIGURE_CACHE') == '1')
+
+    # Write output files
+    write_if_changed(defsfile_output, defsfile_template)
+    write_if_changed(makefile_output, makefile_template)
+
+    # Finish with diagnostic output
+    self_grav_string = 'OFF'
+    if args['grav'] == 'fft':
+        self_grav_string = 'FFT'
+    elif args['grav'] == 'mg':
+        self_grav_string = 'Multigrid'
+
+    # write the configuration optitions into a log file
+    flog = open('./configure.log', 'w')
+
+    output_config('Your Athena++ distribution has now been configured with the following options', '', flog)  # noqa
+    output_config('Problem generator', args['prob'], flog)
+    output_config('Coordinate system', args['coord'], flog)
+    output_config('Equation of state', args['eos'], flog)
+    output_config('Riemann solver', args['flux'], flog)
+    output_config('Magnetic fields', ('ON' if args['b'] else 'OFF'), flog)
+    output_config('Number of scalars', definitions['NUMBER_PASSIVE_SCALARS'], flog)
+    output_config('Number of chemical species', definitions['NUMBER_CHEMICAL_SPECIES'],
+                  flog)
+    output_config('Special relativity', ('ON' if args['s'] else 'OFF'), flog)
+    output_config('General relativity', ('ON' if args['g'] else 'OFF'), flog)
+    output_config('Radiative Transfer', ('ON' if args['nr_radiation'] else 'OFF'), flog)
+    output_config('Implicit Radiation', ('ON' if args['implicit_radiation'] else 'OFF'),
+                  flog)
+    output_config('Cosmic Ray Transport', ('ON' if args['cr'] else 'OFF'), flog)
+    output_config('Cosmic Ray Diffusion', ('ON' if args['crdiff'] else 'OFF'), flog)
+    output_config('Frame transformations', ('ON' if args['t'] else 'OFF'), flog)
+    output_config('Self-Gravity', self_grav_string, flog)
+    output_config('Super-Time-Stepping', ('ON' if args['sts'] else 'OFF'), flog)
+    output_config('Chemistry', (args['chemistry']
+                                if args['chemistry'] is not None else 'OFF'), flog)
+    output_config('KIDA rates', (args['kida_rates']
+                                 if args['kida_rates'] is not None else 'OFF'), flog)
+    output_config('ChemRadiation', (args['chem_radiation'] if args['chem_radiation']
+                                    is not None else 'OFF'), flog)
+    output_config('chem_ode_solver', (args['chem_ode_solver'] if args['chem_ode_solver']
+                                      is not None else 'OFF'), flog)
+    output_config('Debug flags', ('ON' if args['debug'] else 'OFF'), flog)
+    output_config('Code coverage flags', ('ON' if args['coverage'] else 'OFF'), flog)
+    output_config('Linker flags', makefile_options['LINKER_FLAGS'] + ' '
+                  + makefile_options['LIBRARY_FLAGS'], flog)
+    output_config('Floating-point precision', ('single' if args['float'] else 'double'),
+                  flog)
+    output_config('Number of ghost cells', args['nghost'], flog)
+    output_config('MPI parallelism', ('ON' if args['mpi'] else 'OFF'), flog)
+    output_config('OpenMP parallelism', ('ON' if args['omp'] else 'OFF'), flog)
+    output_config('FFT', ('ON' if args['fft'] else 'OFF'), flog)
+    output_config('HDF5 output', ('ON' if args['hdf5'] else 'OFF'), flog)
+    if args['hdf5']:
+        output_config('HDF5 precision', ('double' if args['h5double'] else 'single'),
+                      flog)
+    output_config('Compiler', args['cxx'], flog)
+    output_config('Compilation command', makefile_options['COMPILER_COMMAND'] + ' '
+                  + makefile_options['PREPROCESSOR_FLAGS'] + ' '
+                  + makefile_options['COMPILER_FLAGS'], flog)
+
+    flog.close()
+
+
+if __name__ == '__main__':
+    configure_main()
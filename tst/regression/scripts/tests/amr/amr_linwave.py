@@ -8,9 +8,6 @@
 import logging
 import scripts.utils.athena as athena
 import sys
-sys.path.insert(0, '../../vis/python')
-import athena_read  # noqa
-athena_read.check_nan_flag = True
 logger = logging.getLogger('athena' + __name__[7:])  # set logger name based on module
 
 
@@ -38,17 +35,22 @@ def run(**kwargs):
 
 # Analyze outputs
 def analyze():
-    # read data from error file
+    sys.path.insert(0, '../../vis/python')
+    import athena_read  # noqa
+    athena_read.check_nan_flag = True
+
+    # read RMS-L1-Error and Largest-Max/L1 columns from error file
     filename = 'bin/linearwave-errors.dat'
-    data = athena_read.error_dat(filename)
+    data = athena_read.error_dat(filename, usecols=(4, 13))
+    rms_error, max_rel_error = data[0]
 
     analyze_status = True
-    if data[0][4] > 2.0e-8:
-        logger.warning("RMS error in L-going fast wave too large %g", data[0][4])
+    if rms_error > 2.0e-8:
+        logger.warning("RMS error in L-going fast wave too large %g", rms_error)
         analyze_status = False
-    if data[0][13] > 5.5:
+    if max_rel_error > 5.5:
         logger.warning("maximum relative error in L-going fast wave too large %g",
-                       data[0][13])
+                       max_rel_error)
         analyze_status = False
 
     return analyze_status
@@ -4,9 +4,6 @@
 import logging
 import scripts.utils.athena as athena
 import sys
-sys.path.insert(0, '../../vis/python')
-import athena_read  # noqa
-athena_read.check_nan_flag = True
 logger = logging.getLogger('athena' + __name__[7:])  # set logger name based on module
 
 
@@ -27,6 +24,10 @@ def run(**kwargs):
 
 # Analyze output
 def analyze():
+    sys.path.insert(0, '../../vis/python')
+    import athena_read  # noqa
+    athena_read.check_nan_flag = True
+
     analyze_status = True
     # read data from error file
     filename = 'bin/blastwave-shape.dat'
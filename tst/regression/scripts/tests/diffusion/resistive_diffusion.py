@@ -4,12 +4,9 @@
 
 # Modules
 import logging
+import math
 import scripts.utils.athena as athena
-import numpy as np
 import sys
-sys.path.insert(0, '../../vis/python')
-import athena_read  # noqa
-athena_read.check_nan_flag = True
 logger = logging.getLogger('athena' + __name__[7:])  # set logger name based on module
 
 _amp = 1.e-6
@@ -32,51 +29,60 @@ def prepare(*args, **kwargs):
 
 
 def run(**kwargs):
+    arguments_list = []
     for integrator in sts_integrators:
         for n in resolution_range:
-            arguments = ['job/problem_id=ResistiveDiffusion_'
-                         + repr(n) + '_' + integrator,
+            arguments = [f'job/problem_id=ResistiveDiffusion_{n}_{integrator}',
                          'output2/file_type=tab', 'output2/variable=bcc2',
-                         'output2/data_format=%24.16e', 'output2/dt={}'.format(_tf),
+                         'output2/data_format=%24.16e', f'output2/dt={_tf}',
                          'time/cfl_number=0.8',
-                         'time/tlim={}'.format(_tf), 'time/nlim=10000',
-                         'time/sts_integrator={}'.format(integrator),
+                         f'time/tlim={_tf}', 'time/nlim=10000',
+                         f'time/sts_integrator={integrator}',
                          'time/ncycle_out=0',
-                         'mesh/nx1=' + repr(n),
-                         'mesh/x1min={}'.format(-_Lx1/2.),
-                         'mesh/x1max={}'.format(_Lx1/2.),
+                         f'mesh/nx1={n}',
+                         f'mesh/x1min={-_Lx1/2.}',
+                         f'mesh/x1max={_Lx1/2.}',
                          'mesh/ix1_bc=outflow', 'mesh/ox1_bc=outflow',
                          'mesh/nx2=1', 'mesh/x2min=-1.0', 'mesh/x2max=1.0',
                          'mesh/ix2_bc=periodic', 'mesh/ox2_bc=periodic',
                          'mesh/nx3=1', 'mesh/x3min=-1.0', 'mesh/x3max=1.0',
                          'mesh/ix3_bc=periodic', 'mesh/ox3_bc=periodic',
                          'hydro/iso_sound_speed=1.0',
-                         'problem/amp={}'.format(_amp), 'problem/iprob=0',
-                         'problem/t0={}'.format(_t0),
-                         'problem/eta_ohm={}'.format(_eta)]
-            athena.run('mhd/athinput.resist', arguments)
+                         f'problem/amp={_amp}', 'problem/iprob=0',
+                         f'problem/t0={_t0}',
+                         f'problem/eta_ohm={_eta}']
+            arguments_list.append(arguments)
+    # each run writes to its own problem_id, so they may run concurrently
+    athena.run_all('mhd/athinput.resist', arguments_list)
 
 
 def analyze():
+    import numpy as np
+    sys.path.insert(0, '../../vis/python')
+    import athena_read  # noqa
+    athena_read.check_nan_flag = True
+
     l1ERROR = [[] for err in range(0, len(sts_integrators))]
     conv = []
 
+    # Gaussian profile of the analytic solution at t = t0 + tf
+    four_eta_t = 4.*_eta*(_t0+_tf)
+    norm = _amp/np.sqrt(np.pi*four_eta_t)
     for i in range(len(sts_integrators)):
         for n in resolution_range:
-            x1v, bcc2 = athena_read.tab('bin/ResistiveDiffusion_' + str(n) + '_'
-                                        + sts_integrators[i] + '.block0.out2.00001.tab',
+            x1v, bcc2 = athena_read.tab(f'bin/ResistiveDiffusion_{n}_{sts_integrators[i]}'
+                                        '.block0.out2.00001.tab',
                                         raw=True, dimensions=1)
             dx1 = _Lx1/len(x1v)
-            analytic = (_amp/np.sqrt(4.*np.pi*_eta*(_t0+_tf))
-                        * np.exp(-(x1v**2.)/(4.*_eta*(_t0+_tf))))
-            l1ERROR[i].append(sum(np.absolute(bcc2-analytic)*dx1))
+            analytic = norm*np.exp(-(x1v*x1v)/four_eta_t)
+            l1ERROR[i].append(np.abs(bcc2-analytic).sum()*dx1)
 
     # estimate L1 convergence
     analyze_status = True
     for i in range(len(sts_integrators)):
         method = sts_integrators[i].upper()
-        conv.append(np.diff(np.log(np.array(l1ERROR[i])))
-                    / np.diff(np.log(np.array(resolution_range))))
+        conv.append(math.log(l1ERROR[i][1]/l1ERROR[i][0])
+                    / math.log(resolution_range[1]/resolution_range[0]))
         logger.info('[Resistive Diffusion {}]: Convergence order = {}'
                     .format(method, conv[i]))
 
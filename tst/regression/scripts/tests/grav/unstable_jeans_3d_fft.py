@@ -7,14 +7,23 @@
 
 # Modules
 import logging
-import numpy as np
+import os
 import scripts.utils.athena as athena
 import sys
-sys.path.insert(0, '../../vis/python')
-import athena_read                             # noqa
-athena_read.check_nan_flag = True
 logger = logging.getLogger('athena' + __name__[7:])  # set logger name based on module
 
+# njeans = 1.5
+# period = 0.3
+# 1/omega = 0.046
+# amp 1e-6
+_base_arguments = (
+  'meshblock/nx1=16',
+  'meshblock/nx2=16',
+  'meshblock/nx3=16',
+  'problem/njeans=1.5',
+  'output2/dt=-1', 'time/tlim=0.046', 'problem/compute_error=true',
+  'time/ncycle_out=10')
+
 
 # Prepare Athena++
 def prepare(**kwargs):
@@ -28,32 +37,35 @@ def prepare(**kwargs):
 
 # Run Athena++
 def run(**kwargs):
-    # njeans = 1.5
-    # period = 0.3
-    # 1/omega = 0.046
-    # amp 1e-6
+    resolutions = [32, 64]
+    parallel = athena.run_all_workers(len(resolutions)) > 1
+
     def arg_res(res):
-        arguments = [
-          'mesh/nx1=64', 'mesh/nx2=32', 'mesh/nx3=32',
-          'meshblock/nx1=16',
-          'meshblock/nx2=16',
-          'meshblock/nx3=16',
-          'problem/njeans=1.5',
-          'output2/dt=-1', 'time/tlim=0.046', 'problem/compute_error=true',
-          'time/ncycle_out=10']
-        arguments[0] = 'mesh/nx1='+str(2*res)
-        arguments[1] = 'mesh/nx2='+str(res)
-        arguments[2] = 'mesh/nx3='+str(res)
+        arguments = ['mesh/nx1='+str(2*res), 'mesh/nx2='+str(res), 'mesh/nx3='+str(res),
+                     *_base_arguments]
+        if parallel:
+            # keep the other output files of concurrent runs apart
+            arguments.append('job/problem_id=Jeans'+str(res))
         return arguments
-    athena.run('hydro/athinput.jeans_3d', arg_res(32))
-    athena.run('hydro/athinput.jeans_3d', arg_res(64))
+    if parallel:
+        # Both runs append a row to jeans-errors.dat. Create it first, so that concurrent
+        # runs only append to it instead of racing to create it and write its header.
+        os.makedirs('bin', exist_ok=True)
+        open('bin/jeans-errors.dat', 'a').close()
+    athena.run_all('hydro/athinput.jeans_3d', [arg_res(res) for res in resolutions])
 
 
 # Analyze outputs
 def analyze():
+    import numpy as np
+    sys.path.insert(0, '../../vis/python')
+    import athena_read  # noqa
+    athena_read.check_nan_flag = True
+
     # read data from error file
     filename = 'bin/jeans-errors.dat'
     data = athena_read.error_dat(filename)
+    data = data[data[:, 0].argsort()]  # concurrent runs may finish in any order
     logger.info(str(data))
     result = True
     # error
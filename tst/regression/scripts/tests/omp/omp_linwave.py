@@ -7,25 +7,31 @@
 # Modules
 import logging
 import os
+import shutil
 import scripts.utils.athena as athena
+import scripts.utils.build_cache as build_cache
 import sys
-sys.path.insert(0, '../../vis/python')
-import athena_read                             # noqa
-athena_read.check_nan_flag = True
 logger = logging.getLogger('athena' + __name__[7:])  # set logger name based on module
 
 
 # Prepare Athena++ w/wo OpenMP
 def prepare(**kwargs):
     logger.debug('Running test ' + __name__)
-    athena.configure('b', 'omp', prob='linear_wave', coord='cartesian',
-                     flux='hlld', **kwargs)
-    athena.make()
-    os.system('mv bin/athena bin/athena_omp')
-    os.system('mv obj obj_omp')
+    options = dict(prob='linear_wave', coord='cartesian', flux='hlld', **kwargs)
+    athena.configure('b', 'omp', **options)
+    build_key = build_cache.key('b', 'omp', **options)
+    if not build_cache.fetch(build_key):
+        athena.make()
+        build_cache.store(build_key)
+    os.replace('bin/athena', 'bin/athena_omp')
+    shutil.rmtree('obj_omp', ignore_errors=True)  # left over from an interrupted run
+    os.replace('obj', 'obj_omp')
 
-    athena.configure('b', prob='linear_wave', coord='cartesian', flux='hlld', **kwargs)
-    athena.make()
+    athena.configure('b', **options)
+    build_key = build_cache.key('b', **options)
+    if not build_cache.fetch(build_key):
+        athena.make()
+        build_cache.store(build_key)
 
 
 # Run Athena++ w/wo OpenMP
@@ -40,9 +46,9 @@ def run(**kwargs):
                  'output2/dt=-1', 'time/tlim=2.0', 'problem/compute_error=true']
     athena.run('mhd/athinput.linear_wave3d', arguments, lcov_test_suffix='serial')
 
-    os.system('rm -rf obj')
-    os.system('mv obj_omp obj')
-    os.system('mv bin/athena_omp bin/athena')
+    shutil.rmtree('obj', ignore_errors=True)
+    os.replace('obj_omp', 'obj')
+    os.replace('bin/athena_omp', 'bin/athena')
     athena.run('mhd/athinput.linear_wave3d', arguments + ['mesh/num_threads=1'])
     athena.run('mhd/athinput.linear_wave3d', arguments + ['mesh/num_threads=2'])
     athena.run('mhd/athinput.linear_wave3d', arguments + ['mesh/num_threads=4'],
@@ -52,26 +58,30 @@ def run(**kwargs):
 
 # Analyze outputs
 def analyze():
+    sys.path.insert(0, '../../vis/python')
+    import athena_read  # noqa
+    athena_read.check_nan_flag = True
+
     analyze_status = True
-    # read data from error file
+    # read RMS-L1-Error column from error file: serial, then 1, 2, and 4 threads
     filename = 'bin/linearwave-errors.dat'
-    data = athena_read.error_dat(filename)
+    errors = athena_read.error_dat(filename, usecols=(4,))[:, 0]
 
-    logger.warning("%g %g %g %g", data[0][4], data[1][4], data[2][4], data[3][4])
+    logger.warning("%g %g %g %g", errors[0], errors[1], errors[2], errors[3])
 
     # check errors between runs w/wo OpenMP and different numbers of threads
     fmt = " %g %g"
-    if data[0][4] != data[1][4]:
+    if errors[0] != errors[1]:
         msg = "Linear wave error from serial calculation vs. single thread not identical"
-        logger.warning(msg + fmt, data[0][4], data[1][4])
+        logger.warning(msg + fmt, errors[0], errors[1])
         analyze_status = False
-    if abs(data[2][4] - data[0][4]) > 5.0e-4:
+    if abs(errors[2] - errors[0]) > 5.0e-4:
         msg = "Linear wave error differences between 2 threads vs. serial is too large"
-        logger.warning(msg + fmt, data[2][4], data[0][4])
+        logger.warning(msg + fmt, errors[2], errors[0])
         analyze_status = False
-    if abs(data[3][4] - data[0][4]) > 5.0e-4:
+    if abs(errors[3] - errors[0]) > 5.0e-4:
         msg = "Linear wave error differences between 4 threads vs. serial is too large"
-        logger.warning(msg + fmt, data[3][4], data[0][4])
+        logger.warning(msg + fmt, errors[3], errors[0])
         analyze_status = False
 
     return analyze_status
@@ -1,10 +1,15 @@
 # Functions for interfacing with Athena++ during testing
 
 # Modules
+import contextlib
+import functools
+import importlib.util
+import io
 import logging
+import multiprocessing
 import os
-import sys
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from timeit import default_timer as timer
 from .log_pipe import LogPipe
 
@@ -19,13 +24,22 @@ global_coverage_cmd = None
 global_silent = False
 
 
+# Function for loading configure.py as a module; it is run in-process so that identical
+# configurations within one test session reuse its cached results
+@functools.lru_cache(maxsize=1)
+def configure_module(filename):
+    spec = importlib.util.spec_from_file_location('athena_configure', filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
 # Function for configuring Athena++
 def configure(*args, **kwargs):
     current_dir = os.getcwd()
     os.chdir(athena_rel_path)
     try:
-        pybin = sys.executable if sys.executable is not None else 'python'
-        configure_command = [pybin, 'configure.py']
+        configure_command = ['configure.py']
         for arg in args:
             configure_command.append('-{0}'.format(arg))
         for key, val in kwargs.items():
@@ -33,19 +47,28 @@ def configure(*args, **kwargs):
                 configure_command.append('--{0}={1}'.format(key, val))
         if global_coverage_cmd is not None:
             configure_command.append('-coverage')
-        out_log = LogPipe('athena.configure', logging.INFO)
-        err_log = LogPipe('athena.configure', logging.ERROR)
-        cmd = ' '.join(['Executing: '] + configure_command + global_config_args)
-        logging.getLogger('athena.configure').debug(cmd)
+        configure_command += global_config_args
+        logger = logging.getLogger('athena.configure')
+        logger.debug(' '.join(['Executing: '] + configure_command))
+        out_log, err_log = io.StringIO(), io.StringIO()
         try:
-            subprocess.check_call(configure_command + global_config_args,
-                                  stdout=out_log, stderr=err_log)
-        except subprocess.CalledProcessError as err:
-            raise AthenaError('Return code {0} from command \'{1}\''
-                              .format(err.returncode, ' '.join(err.cmd)))
+            with contextlib.redirect_stdout(out_log), contextlib.redirect_stderr(err_log):
+                configure_module(os.path.abspath('configure.py')).configure_main(
+                    configure_command[1:])
+        except SystemExit as err:
+            # same return code and message as running configure.py from the command line
+            returncode = err.code
+            if isinstance(returncode, str):
+                err_log.write(returncode + '\n')
+                returncode = 1
+            if returncode:
+                raise AthenaError('Return code {0} from command \'{1}\''
+                                  .format(returncode, ' '.join(configure_command)))
         finally:
-            out_log.close()
-            err_log.close()
+            for line in out_log.getvalue().splitlines():
+                logger.info(line)
+            for line in err_log.getvalue().splitlines():
+                logger.error(line)
     finally:
         os.chdir(current_dir)
 
@@ -114,6 +137,29 @@ def run(input_filename, arguments, lcov_test_suffix=None):
         os.chdir(current_dir)
 
 
+# Function for the number of processes run_all() uses for the given number of runs; more
+# than one only if ATHENA_TEST_PARALLEL=1
+def run_all_workers(count):
+    if os.environ.get('ATHENA_TEST_PARALLEL') != '1':
+        return 1
+    return min(count, os.cpu_count() or 1)
+
+
+# Function for running Athena++ once for each list of arguments. When run_all_workers()
+# is more than one the runs are executed concurrently, and must not write to the same
+# output files
+def run_all(input_filename, arguments_list):
+    max_workers = run_all_workers(len(arguments_list))
+    if max_workers == 1:
+        for arguments in arguments_list:
+            run(input_filename, arguments)
+        return
+    # fork, so that the workers inherit the global settings from run_tests.py
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=multiprocessing.get_context('fork')) as executor:
+        list(executor.map(functools.partial(run, input_filename), arguments_list))
+
+
 def restart(input_filename, arguments):
     current_dir = os.getcwd()
     os.chdir('bin')
@@ -177,7 +223,8 @@ def restore_files():
     for filename, saved_file in zip(saved_filenames, saved_files):
         rel_path_to_file = athena_rel_path + filename
         if saved_file is None:
-            os.system('rm -f ' + rel_path_to_file)
+            if os.path.isfile(rel_path_to_file):
+                os.remove(rel_path_to_file)
         else:
             with open(rel_path_to_file, 'w') as current_file:
                 current_file.write(saved_file)
@@ -0,0 +1,76 @@
+# Functions for reusing Athena++ executables across regression test runs
+#
+# Opt in by setting ATHENA_BUILD_CACHE=1 in the environment. Executables are keyed on the
+# configure arguments and the newest modification time of the source tree, and kept in
+# .build_cache/ (bin/ and obj/ are removed by run_tests.py before every test).
+
+# Modules
+import glob
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from . import athena
+
+# Global variables
+cache_dir = '.build_cache'
+source_patterns = ['src/**/*.cpp', 'src/**/*.hpp', 'src/defs.hpp.in', 'Makefile.in',
+                   'configure.py']
+generated_files = ['src/defs.hpp']
+
+
+# Function for checking whether the cache may be used
+def enabled():
+    # Coverage runs need the object files, which are not cached
+    return (os.environ.get('ATHENA_BUILD_CACHE') == '1'
+            and athena.global_coverage_cmd is None)
+
+
+# Function for computing the cache key of a build with the given configure arguments;
+# returns None without looking at the source tree when the cache is disabled
+def key(*args, **kwargs):
+    if not enabled():
+        return None
+    configure_args = (list(args) + sorted('{0}={1}'.format(k, v)
+                                          for k, v in kwargs.items() if v)
+                      + athena.global_config_args)
+    generated = [athena.athena_rel_path + name for name in generated_files]
+    newest = 0
+    for pattern in source_patterns:
+        for path in glob.glob(athena.athena_rel_path + pattern, recursive=True):
+            if path not in generated:
+                newest = max(newest, os.stat(path).st_mtime_ns)
+    return hashlib.sha1(repr((configure_args, newest)).encode()).hexdigest()
+
+
+# Function for copying a cached executable to bin/athena; returns True on a cache hit
+def fetch(build_key):
+    if build_key is None:
+        return False
+    cached_exe = os.path.join(cache_dir, build_key, 'athena')
+    if not os.path.isfile(cached_exe):
+        return False
+    logging.getLogger('athena.make').debug('Using cached executable ' + cached_exe)
+    os.makedirs('bin', exist_ok=True)
+    # tests that keep several builds also move obj/ around, so it must exist
+    os.makedirs('obj', exist_ok=True)
+    shutil.copy2(cached_exe, 'bin/athena')
+    return True
+
+
+# Function for saving bin/athena in the cache after a successful build
+def store(build_key):
+    if build_key is None:
+        return
+    build_dir = os.path.join(cache_dir, build_key)
+    os.makedirs(build_dir, exist_ok=True)
+    # copy under a temporary name first, so that fetch() never sees a partial executable
+    fd, temporary_name = tempfile.mkstemp(dir=build_dir)
+    os.close(fd)
+    try:
+        shutil.copy2('bin/athena', temporary_name)
+        os.replace(temporary_name, os.path.join(build_dir, 'athena'))
+    except BaseException:
+        os.remove(temporary_name)
+        raise